@@ -13,21 +13,29 @@ Requirements:
 Environment Variables:
 - NUTRITIONIX_APP_ID: Your Nutritionix application ID
 - NUTRITIONIX_APP_KEY: Your Nutritionix application key
+- MCP_PRETTY_JSON: Set to "1" to indent JSON responses for debugging (default: compact)
 """
 
 import os
-import json
-from typing import Any, Dict, List, Optional
-from datetime import datetime, timedelta
+import re
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+from datetime import date, timedelta
+from types import MappingProxyType
 import httpx
 from mcp.server.fastmcp import FastMCP
 
+# orjson is much faster, but the stdlib json module works as a fallback
+try:
+    import orjson
+except ImportError:
+    import json
+    orjson = None
 
-# Initialize the MCP server
-mcp = FastMCP(
-    "Fitness & Nutrition API",
-    dependencies=["httpx"]
-)
 
 # API configurations
 NUTRITIONIX_BASE_URL = "https://trackapi.nutritionix.com/v2"
@@ -41,7 +49,6 @@ if not NUTRITIONIX_APP_ID or not NUTRITIONIX_APP_KEY:
         "Missing Nutritionix API credentials. Please set NUTRITIONIX_APP_ID and NUTRITIONIX_APP_KEY environment variables."
     )
 
-
 def get_nutritionix_headers() -> Dict[str, str]:
     """Get headers for Nutritionix API requests."""
     return {
@@ -59,6 +66,252 @@ def get_wger_headers() -> Dict[str, str]:
     }
 
 
+def create_api_client(base_url: str, headers: Dict[str, str]) -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP client bound to one upstream API.
+    
+    Connections (and their TLS sessions) are kept alive and reused across tool
+    calls, and HTTP/2 lets concurrent requests multiplex over one connection.
+    No transport is passed so httpx keeps honouring HTTP_PROXY, HTTPS_PROXY and
+    NO_PROXY; failed connection attempts are retried in send_attempt instead.
+    With the brotli extra installed, httpx advertises and decodes "br" alongside gzip.
+    """
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30),
+        timeout=httpx.Timeout(15.0)
+    )
+
+
+# Shared clients, one per upstream API, with base URL and headers bound once
+NUTRITIONIX_CLIENT = create_api_client(NUTRITIONIX_BASE_URL, get_nutritionix_headers())
+WGER_CLIENT = create_api_client(WGER_BASE_URL, get_wger_headers())
+
+# Cap concurrent requests per upstream so bursts of tool calls don't trip rate limits
+NUTRITIONIX_SEMAPHORE = asyncio.Semaphore(4)
+WGER_SEMAPHORE = asyncio.Semaphore(8)
+
+
+# Sessions currently inside the lifespan; the clients are closed after the last one ends
+ACTIVE_SESSIONS = 0
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """
+    Close the shared HTTP clients when the last active session ends.
+    
+    The SSE and streamable-http transports enter the lifespan once per session,
+    so the closed clients are swapped for fresh ones before the next session starts.
+    """
+    global ACTIVE_SESSIONS, NUTRITIONIX_CLIENT, WGER_CLIENT
+    ACTIVE_SESSIONS += 1
+    try:
+        yield
+    finally:
+        ACTIVE_SESSIONS -= 1
+        if ACTIVE_SESSIONS == 0:
+            clients = (NUTRITIONIX_CLIENT, WGER_CLIENT)
+            NUTRITIONIX_CLIENT = create_api_client(NUTRITIONIX_BASE_URL, get_nutritionix_headers())
+            WGER_CLIENT = create_api_client(WGER_BASE_URL, get_wger_headers())
+            for client in clients:
+                await client.aclose()
+
+
+# Use uvloop's faster event loop where it is available (it does not support Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+else:
+    uvloop.install()
+
+# Initialize the MCP server
+mcp = FastMCP(
+    "Fitness & Nutrition API",
+    dependencies=["httpx[http2,brotli]", "orjson", 'uvloop; sys_platform != "win32"'],
+    lifespan=lifespan
+)
+
+
+# Connection attempts that fail before anything is sent are retried, the second after a pause
+CONNECT_RETRIES = 2
+CONNECT_BACKOFF = 0.5
+
+# Rate-limited (429) responses are retried with exponential backoff, capped per wait
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF = 0.5
+RATE_LIMIT_MAX_DELAY = 8.0
+
+
+async def send_attempt(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                       method: str, path: str, **kwargs: Any) -> httpx.Response:
+    """
+    Send one request bounded by `semaphore`, retrying failed connection attempts.
+    
+    Only connect errors and timeouts are retried; they are raised before the request
+    is written, so a POST is never sent twice.
+    """
+    for attempt in range(CONNECT_RETRIES):
+        try:
+            async with semaphore:
+                return await client.request(method, path, **kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            await asyncio.sleep(CONNECT_BACKOFF * attempt)
+    
+    async with semaphore:
+        return await client.request(method, path, **kwargs)
+
+
+async def send_request(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                       method: str, path: str, **kwargs: Any) -> httpx.Response:
+    """
+    Send a request through send_attempt, retrying 429 responses with exponential backoff.
+    
+    The semaphore is released while backing off so other requests can proceed, and a
+    numeric Retry-After header is honoured up to RATE_LIMIT_MAX_DELAY seconds. Once the
+    retries are used up the last 429 response is returned to the caller.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES):
+        response = await send_attempt(client, semaphore, method, path, **kwargs)
+        if response.status_code != 429:
+            return response
+        delay = RATE_LIMIT_BACKOFF * 2 ** attempt
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        await asyncio.sleep(min(delay, RATE_LIMIT_MAX_DELAY))
+    
+    return await send_attempt(client, semaphore, method, path, **kwargs)
+
+
+async def nutritionix_request(method: str, path: str, **kwargs: Any) -> httpx.Response:
+    """Send a request to the Nutritionix API, bounded by NUTRITIONIX_SEMAPHORE."""
+    return await send_request(NUTRITIONIX_CLIENT, NUTRITIONIX_SEMAPHORE, method, path, **kwargs)
+
+
+async def wger_request(method: str, path: str, **kwargs: Any) -> httpx.Response:
+    """Send a request to the WGER API, bounded by WGER_SEMAPHORE."""
+    return await send_request(WGER_CLIENT, WGER_SEMAPHORE, method, path, **kwargs)
+
+
+# Indented output is easier to read while debugging but costs time and tokens
+PRETTY_JSON = os.getenv("MCP_PRETTY_JSON", "").lower() in ("1", "true", "yes")
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Serialize a tool response to a JSON string, compact unless MCP_PRETTY_JSON is set."""
+    if orjson is not None:
+        option = (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if PRETTY_JSON else 0)
+        return orjson.dumps(obj, option=option).decode()
+    if PRETTY_JSON:
+        return json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=sort_keys)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys)
+
+
+def loads(data: bytes) -> Any:
+    """Parse a JSON response body."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+# Reference data barely changes upstream, so parsed responses are reused for a while
+NUTRITIONIX_CACHE_TTL = 3600.0
+WGER_CACHE_TTL = 86400.0
+RESPONSE_CACHE_MAXSIZE = 2048
+RESPONSE_CACHE: Dict[Tuple[str, str, str, str], Tuple[float, Any]] = {}
+RESPONSE_LOCKS: Dict[Tuple[str, str, str, str], asyncio.Lock] = {}
+RESPONSE_LOCK_USERS: Dict[Tuple[str, str, str, str], int] = {}
+
+
+async def cached_request(send: Callable[..., Awaitable[httpx.Response]], ttl: float,
+                         method: str, path: str, **kwargs: Any) -> Any:
+    """
+    Send a request and return its parsed JSON body, cached for `ttl` seconds.
+    
+    Identical concurrent calls wait on one upstream request instead of each
+    sending their own. Error responses raise httpx.HTTPStatusError and are not cached.
+    At most RESPONSE_CACHE_MAXSIZE responses are kept; the oldest is evicted first.
+    """
+    key = (send.__name__, method, path, dumps(kwargs, sort_keys=True))
+    cached = RESPONSE_CACHE.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    lock = RESPONSE_LOCKS.setdefault(key, asyncio.Lock())
+    RESPONSE_LOCK_USERS[key] = RESPONSE_LOCK_USERS.get(key, 0) + 1
+    try:
+        async with lock:
+            cached = RESPONSE_CACHE.get(key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+            
+            response = await send(method, path, **kwargs)
+            response.raise_for_status()
+            
+            data = loads(response.content)
+            RESPONSE_CACHE.pop(key, None)
+            if len(RESPONSE_CACHE) >= RESPONSE_CACHE_MAXSIZE:
+                RESPONSE_CACHE.pop(next(iter(RESPONSE_CACHE)))
+            RESPONSE_CACHE[key] = (time.monotonic() + ttl, data)
+            return data
+    finally:
+        # Locks are only needed while a caller is holding or waiting on them
+        RESPONSE_LOCK_USERS[key] -= 1
+        if not RESPONSE_LOCK_USERS[key]:
+            del RESPONSE_LOCK_USERS[key]
+            del RESPONSE_LOCKS[key]
+
+
+async def nutritionix_json(method: str, path: str, **kwargs: Any) -> Any:
+    """Fetch parsed JSON from the Nutritionix API, cached for NUTRITIONIX_CACHE_TTL seconds."""
+    return await cached_request(nutritionix_request, NUTRITIONIX_CACHE_TTL, method, path, **kwargs)
+
+
+async def wger_json(method: str, path: str, **kwargs: Any) -> Any:
+    """Fetch parsed JSON from the WGER API, cached for WGER_CACHE_TTL seconds."""
+    return await cached_request(wger_request, WGER_CACHE_TTL, method, path, **kwargs)
+
+
+def lookup(table: Mapping[str, Any], name: str, default: Any = None) -> Any:
+    """Look up a user-supplied name in a lowercase-keyed table, lowercasing it only on a miss."""
+    value = table.get(name)
+    if value is None:
+        value = table.get(name.lower(), default)
+    return value
+
+
+# Matches any HTML tag in WGER's exercise descriptions
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def strip_html(text: Optional[str]) -> str:
+    """Remove HTML tags from a WGER description in a single pass."""
+    return HTML_TAG_PATTERN.sub("", text or "")
+
+
+# Muscle group mapping to WGER muscle IDs
+MUSCLE_IDS = MappingProxyType({
+    "chest": (4,),  # Chest
+    "back": (12, 13),  # Lats, Rhomboids
+    "shoulders": (2, 3),  # Anterior deltoid, Posterior deltoid
+    "arms": (1, 5, 8),  # Biceps, Triceps, Forearms
+    "legs": (10, 11, 7, 9),  # Quadriceps, Hamstrings, Glutes, Calves
+    "abs": (14, 6),  # Rectus abdominis, Obliques
+    "core": (14, 6)  # Same as abs
+})
+
+# Muscle groups used to seed the workout section of fitness plans
+PLAN_MUSCLE_GROUPS = ("chest", "back", "legs", "shoulders", "arms")
+
+# The WGER exercise catalog rarely changes, so plan exercise summaries are cached per muscle
+EXERCISE_CACHE_TTL = WGER_CACHE_TTL
+EXERCISE_CACHE: Dict[Tuple[int, int], Tuple[float, Tuple[Dict[str, str], ...]]] = {}
+# Loads in flight, keyed by per_muscle, so concurrent plans share one
+EXERCISE_FETCHES: Dict[int, "asyncio.Task[Any]"] = {}
+
+
 # =============================================================================
 # NUTRITIONIX API ENDPOINTS
 # =============================================================================
@@ -78,52 +331,66 @@ async def search_foods(query: str, limit: int = 10) -> str:
     if limit > 50:
         limit = 50
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{NUTRITIONIX_BASE_URL}/search/instant",
-                headers=get_nutritionix_headers(),
-                params={
-                    "query": query,
-                    "detailed": True
-                }
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            results = {
+    per_type = limit // 2
+    if per_type <= 0:
+        return dumps({"query": query, "common_foods": [], "branded_foods": []})
+    
+    try:
+        data = await nutritionix_json(
+            "GET", "/search/instant",
+            params={
                 "query": query,
-                "common_foods": [],
-                "branded_foods": []
+                "detailed": True
             }
-            
-            if "common" in data:
-                for food in data["common"][:limit//2]:
-                    results["common_foods"].append({
-                        "food_name": food.get("food_name"),
-                        "serving_unit": food.get("serving_unit"),
-                        "tag_name": food.get("tag_name"),
-                        "tag_id": food.get("tag_id")
-                    })
-            
-            if "branded" in data:
-                for food in data["branded"][:limit//2]:
-                    results["branded_foods"].append({
-                        "food_name": food.get("food_name"),
-                        "brand_name": food.get("brand_name"),
-                        "serving_unit": food.get("serving_unit"),
-                        "nf_calories": food.get("nf_calories"),
-                        "nix_brand_id": food.get("nix_brand_id"),
-                        "nix_item_id": food.get("nix_item_id")
-                    })
-            
-            return json.dumps(results, indent=2)
-            
-        except httpx.HTTPStatusError as e:
-            return f"API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error searching foods: {str(e)}"
+        )
+        
+        results = {
+            "query": query,
+            "common_foods": [
+                {
+                    "food_name": food.get("food_name"),
+                    "serving_unit": food.get("serving_unit"),
+                    "tag_name": food.get("tag_name"),
+                    "tag_id": food.get("tag_id")
+                }
+                for food in data.get("common", ())[:per_type]
+            ],
+            "branded_foods": [
+                {
+                    "food_name": food.get("food_name"),
+                    "brand_name": food.get("brand_name"),
+                    "serving_unit": food.get("serving_unit"),
+                    "nf_calories": food.get("nf_calories"),
+                    "nix_brand_id": food.get("nix_brand_id"),
+                    "nix_item_id": food.get("nix_item_id")
+                }
+                for food in data.get("branded", ())[:per_type]
+            ]
+        }
+        
+        return dumps(results)
+        
+    except httpx.HTTPStatusError as e:
+        return f"API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error searching foods: {str(e)}"
+
+
+# Nutrients reported by get_food_nutrients, as (output key, Nutritionix field, unit)
+FOOD_MACRONUTRIENTS = (
+    ("total_fat", "nf_total_fat", "g"),
+    ("saturated_fat", "nf_saturated_fat", "g"),
+    ("cholesterol", "nf_cholesterol", "mg"),
+    ("sodium", "nf_sodium", "mg"),
+    ("total_carbohydrate", "nf_total_carbohydrate", "g"),
+    ("dietary_fiber", "nf_dietary_fiber", "g"),
+    ("sugars", "nf_sugars", "g"),
+    ("protein", "nf_protein", "g")
+)
+FOOD_MINERALS = (
+    ("potassium", "nf_potassium", "mg"),
+    ("phosphorus", "nf_phosphorus", "mg")
+)
 
 
 @mcp.tool()
@@ -144,54 +411,52 @@ async def get_food_nutrients(food_name: str, quantity: float = 1.0, unit: str =
     else:
         query = food_name
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{NUTRITIONIX_BASE_URL}/natural/nutrients",
-                headers=get_nutritionix_headers(),
-                json={"query": query}
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if "foods" not in data or not data["foods"]:
-                return f"No nutritional information found for: {query}"
-            
-            food = data["foods"][0]
-            
-            nutrition_info = {
-                "food_name": food.get("food_name"),
-                "brand_name": food.get("brand_name"),
-                "serving_qty": food.get("serving_qty"),
-                "serving_unit": food.get("serving_unit"),
-                "serving_weight_grams": food.get("serving_weight_grams"),
-                "calories": food.get("nf_calories"),
-                "macronutrients": {
-                    "total_fat": f"{food.get('nf_total_fat', 0)}g",
-                    "saturated_fat": f"{food.get('nf_saturated_fat', 0)}g",
-                    "cholesterol": f"{food.get('nf_cholesterol', 0)}mg",
-                    "sodium": f"{food.get('nf_sodium', 0)}mg",
-                    "total_carbohydrate": f"{food.get('nf_total_carbohydrate', 0)}g",
-                    "dietary_fiber": f"{food.get('nf_dietary_fiber', 0)}g",
-                    "sugars": f"{food.get('nf_sugars', 0)}g",
-                    "protein": f"{food.get('nf_protein', 0)}g"
-                },
-                "vitamins_minerals": {
-                    "potassium": f"{food.get('nf_potassium', 0)}mg",
-                    "phosphorus": f"{food.get('nf_phosphorus', 0)}mg"
-                }
+    try:
+        data = await nutritionix_json(
+            "POST", "/natural/nutrients",
+            json={"query": query}
+        )
+        
+        if "foods" not in data or not data["foods"]:
+            return f"No nutritional information found for: {query}"
+        
+        food = data["foods"][0]
+        
+        nutrition_info = {
+            "food_name": food.get("food_name"),
+            "brand_name": food.get("brand_name"),
+            "serving_qty": food.get("serving_qty"),
+            "serving_unit": food.get("serving_unit"),
+            "serving_weight_grams": food.get("serving_weight_grams"),
+            "calories": food.get("nf_calories"),
+            "macronutrients": {
+                name: f"{food.get(field, 0)}{unit}" for name, field, unit in FOOD_MACRONUTRIENTS
+            },
+            "vitamins_minerals": {
+                name: f"{food.get(field, 0)}{unit}" for name, field, unit in FOOD_MINERALS
             }
-            
-            if food.get("photo", {}).get("thumb"):
-                nutrition_info["photo_url"] = food["photo"]["thumb"]
-            
-            return json.dumps(nutrition_info, indent=2)
-            
-        except httpx.HTTPStatusError as e:
-            return f"API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error getting nutritional information: {str(e)}"
+        }
+        
+        if food.get("photo", {}).get("thumb"):
+            nutrition_info["photo_url"] = food["photo"]["thumb"]
+        
+        return dumps(nutrition_info)
+        
+    except httpx.HTTPStatusError as e:
+        return f"API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error getting nutritional information: {str(e)}"
+
+
+# Nutrients shown side by side by compare_foods, as (output key, Nutritionix field)
+COMPARE_NUTRIENT_FIELDS = (
+    ("calories", "nf_calories"),
+    ("protein", "nf_protein"),
+    ("carbs", "nf_total_carbohydrate"),
+    ("fat", "nf_total_fat"),
+    ("fiber", "nf_dietary_fiber"),
+    ("sodium", "nf_sodium")
+)
 
 
 @mcp.tool()
@@ -208,74 +473,53 @@ async def compare_foods(food1: str, food2: str, quantity: float = 1.0, unit: str
     Returns:
         JSON string containing side-by-side nutritional comparison
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            if quantity != 1.0 or unit != "serving":
-                query1 = f"{quantity} {unit} {food1}"
-                query2 = f"{quantity} {unit} {food2}"
-            else:
-                query1 = food1
-                query2 = food2
-            
-            response1 = await client.post(
-                f"{NUTRITIONIX_BASE_URL}/natural/nutrients",
-                headers=get_nutritionix_headers(),
-                json={"query": query1}
-            )
-            response2 = await client.post(
-                f"{NUTRITIONIX_BASE_URL}/natural/nutrients",
-                headers=get_nutritionix_headers(),
-                json={"query": query2}
-            )
-            
-            response1.raise_for_status()
-            response2.raise_for_status()
-            
-            data1 = response1.json()
-            data2 = response2.json()
-            
-            if not data1.get("foods") or not data2.get("foods"):
-                return "Could not find nutritional information for one or both foods"
-            
-            food1_data = data1["foods"][0]
-            food2_data = data2["foods"][0]
-            
-            comparison = {
-                "comparison_query": f"{query1} vs {query2}",
-                "food1": {
-                    "name": food1_data.get("food_name"),
-                    "calories": food1_data.get("nf_calories", 0),
-                    "protein": food1_data.get("nf_protein", 0),
-                    "carbs": food1_data.get("nf_total_carbohydrate", 0),
-                    "fat": food1_data.get("nf_total_fat", 0),
-                    "fiber": food1_data.get("nf_dietary_fiber", 0),
-                    "sodium": food1_data.get("nf_sodium", 0)
-                },
-                "food2": {
-                    "name": food2_data.get("food_name"),
-                    "calories": food2_data.get("nf_calories", 0),
-                    "protein": food2_data.get("nf_protein", 0),
-                    "carbs": food2_data.get("nf_total_carbohydrate", 0),
-                    "fat": food2_data.get("nf_total_fat", 0),
-                    "fiber": food2_data.get("nf_dietary_fiber", 0),
-                    "sodium": food2_data.get("nf_sodium", 0)
-                },
-                "differences": {
-                    "calories": food2_data.get("nf_calories", 0) - food1_data.get("nf_calories", 0),
-                    "protein": food2_data.get("nf_protein", 0) - food1_data.get("nf_protein", 0),
-                    "carbs": food2_data.get("nf_total_carbohydrate", 0) - food1_data.get("nf_total_carbohydrate", 0),
-                    "fat": food2_data.get("nf_total_fat", 0) - food1_data.get("nf_total_fat", 0),
-                    "fiber": food2_data.get("nf_dietary_fiber", 0) - food1_data.get("nf_dietary_fiber", 0),
-                    "sodium": food2_data.get("nf_sodium", 0) - food1_data.get("nf_sodium", 0)
-                }
-            }
-            
-            return json.dumps(comparison, indent=2)
-            
-        except httpx.HTTPStatusError as e:
-            return f"API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error comparing foods: {str(e)}"
+    try:
+        if quantity != 1.0 or unit != "serving":
+            query1 = f"{quantity} {unit} {food1}"
+            query2 = f"{quantity} {unit} {food2}"
+        else:
+            query1 = food1
+            query2 = food2
+        
+        data1, data2 = await asyncio.gather(
+            nutritionix_json("POST", "/natural/nutrients", json={"query": query1}),
+            nutritionix_json("POST", "/natural/nutrients", json={"query": query2})
+        )
+        
+        if not data1.get("foods") or not data2.get("foods"):
+            return "Could not find nutritional information for one or both foods"
+        
+        food1_data = data1["foods"][0]
+        food2_data = data2["foods"][0]
+        values1 = [food1_data.get(field) or 0 for _, field in COMPARE_NUTRIENT_FIELDS]
+        values2 = [food2_data.get(field) or 0 for _, field in COMPARE_NUTRIENT_FIELDS]
+        nutrient_keys = [key for key, _ in COMPARE_NUTRIENT_FIELDS]
+        
+        comparison = {
+            "comparison_query": f"{query1} vs {query2}",
+            "food1": {"name": food1_data.get("food_name"), **dict(zip(nutrient_keys, values1))},
+            "food2": {"name": food2_data.get("food_name"), **dict(zip(nutrient_keys, values2))},
+            "differences": {key: b - a for key, a, b in zip(nutrient_keys, values1, values2)}
+        }
+        
+        return dumps(comparison)
+        
+    except httpx.HTTPStatusError as e:
+        return f"API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error comparing foods: {str(e)}"
+
+
+# Per-food nutrients summed by analyze_meal, as (output key, Nutritionix field)
+MEAL_NUTRIENT_FIELDS = (
+    ("calories", "nf_calories"),
+    ("protein", "nf_protein"),
+    ("carbs", "nf_total_carbohydrate"),
+    ("fat", "nf_total_fat"),
+    ("fiber", "nf_dietary_fiber"),
+    ("sodium", "nf_sodium"),
+    ("sugar", "nf_sugars")
+)
 
 
 @mcp.tool()
@@ -290,88 +534,177 @@ async def analyze_meal(foods_list: List[str], meal_name: str = "Custom Meal") ->
     Returns:
         JSON string containing total nutritional analysis of the meal
     """
-    async with httpx.AsyncClient() as client:
+    try:
+        meal_query = ", ".join(foods_list)
+        
         try:
-            meal_query = ", ".join(foods_list)
-            
-            response = await client.post(
-                f"{NUTRITIONIX_BASE_URL}/natural/nutrients",
-                headers=get_nutritionix_headers(),
+            data = await nutritionix_json(
+                "POST", "/natural/nutrients",
                 json={"query": meal_query}
             )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if "foods" not in data or not data["foods"]:
-                return f"No nutritional information found for meal: {meal_query}"
-            
-            totals = {
-                "calories": 0,
-                "protein": 0,
-                "carbs": 0,
-                "fat": 0,
-                "fiber": 0,
-                "sodium": 0,
-                "sugar": 0
+        except httpx.HTTPStatusError as e:
+            # Nutritionix answers 404 when it can't match the query as a whole;
+            # a single item has nothing to fall back to, so report the error as is
+            if e.response.status_code != 404 or len(foods_list) <= 1:
+                raise
+            data = {}
+        
+        foods = data.get("foods")
+        if not foods and len(foods_list) > 1:
+            # Look items up one by one so the foods that do match still count
+            responses = await asyncio.gather(
+                *(
+                    nutritionix_json("POST", "/natural/nutrients", json={"query": item})
+                    for item in foods_list
+                ),
+                return_exceptions=True
+            )
+            foods = [
+                food
+                for response in responses
+                if not isinstance(response, BaseException)
+                for food in response.get("foods") or ()
+            ]
+        
+        if not foods:
+            return f"No nutritional information found for meal: {meal_query}"
+        
+        nutrient_keys = [key for key, _ in MEAL_NUTRIENT_FIELDS]
+        rows = [[food.get(field) or 0 for _, field in MEAL_NUTRIENT_FIELDS] for food in foods]
+        
+        food_breakdown = [
+            {
+                "name": food.get("food_name"),
+                "quantity": food.get("serving_qty"),
+                "unit": food.get("serving_unit"),
+                **dict(zip(nutrient_keys, values))
             }
-            
-            food_breakdown = []
-            
-            for food in data["foods"]:
-                food_info = {
-                    "name": food.get("food_name"),
-                    "quantity": food.get("serving_qty"),
-                    "unit": food.get("serving_unit"),
-                    "calories": food.get("nf_calories", 0),
-                    "protein": food.get("nf_protein", 0),
-                    "carbs": food.get("nf_total_carbohydrate", 0),
-                    "fat": food.get("nf_total_fat", 0),
-                    "fiber": food.get("nf_dietary_fiber", 0),
-                    "sodium": food.get("nf_sodium", 0),
-                    "sugar": food.get("nf_sugars", 0)
-                }
-                food_breakdown.append(food_info)
-                
-                totals["calories"] += food.get("nf_calories", 0)
-                totals["protein"] += food.get("nf_protein", 0)
-                totals["carbs"] += food.get("nf_total_carbohydrate", 0)
-                totals["fat"] += food.get("nf_total_fat", 0)
-                totals["fiber"] += food.get("nf_dietary_fiber", 0)
-                totals["sodium"] += food.get("nf_sodium", 0)
-                totals["sugar"] += food.get("nf_sugars", 0)
-            
-            total_calories = totals["calories"]
-            macro_percentages = {}
-            if total_calories > 0:
-                macro_percentages = {
-                    "protein_percent": round((totals["protein"] * 4 / total_calories) * 100, 1),
-                    "carbs_percent": round((totals["carbs"] * 4 / total_calories) * 100, 1),
-                    "fat_percent": round((totals["fat"] * 9 / total_calories) * 100, 1)
-                }
-            
-            meal_analysis = {
-                "meal_name": meal_name,
-                "foods_analyzed": len(food_breakdown),
-                "total_nutrition": {
-                    "calories": round(totals["calories"], 1),
-                    "protein": f"{round(totals['protein'], 1)}g",
-                    "carbohydrates": f"{round(totals['carbs'], 1)}g",
-                    "fat": f"{round(totals['fat'], 1)}g",
-                    "fiber": f"{round(totals['fiber'], 1)}g",
-                    "sodium": f"{round(totals['sodium'], 1)}mg",
-                    "sugar": f"{round(totals['sugar'], 1)}g"
-                },
-                "macronutrient_distribution": macro_percentages,
-                "food_breakdown": food_breakdown
+            for food, values in zip(foods, rows)
+        ]
+        
+        # Sum each nutrient column in one pass, without float drift across many foods
+        totals = dict(zip(nutrient_keys, map(math.fsum, zip(*rows))))
+        
+        total_calories = totals["calories"]
+        macro_percentages = {}
+        if total_calories > 0:
+            macro_percentages = {
+                "protein_percent": round((totals["protein"] * 4 / total_calories) * 100, 1),
+                "carbs_percent": round((totals["carbs"] * 4 / total_calories) * 100, 1),
+                "fat_percent": round((totals["fat"] * 9 / total_calories) * 100, 1)
             }
-            
-            return json.dumps(meal_analysis, indent=2)
-            
-        except httpx.HTTPStatusError as e:
-            return f"API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error analyzing meal: {str(e)}"
+        
+        meal_analysis = {
+            "meal_name": meal_name,
+            "foods_analyzed": len(food_breakdown),
+            "total_nutrition": {
+                "calories": round(totals["calories"], 1),
+                "protein": f"{round(totals['protein'], 1)}g",
+                "carbohydrates": f"{round(totals['carbs'], 1)}g",
+                "fat": f"{round(totals['fat'], 1)}g",
+                "fiber": f"{round(totals['fiber'], 1)}g",
+                "sodium": f"{round(totals['sodium'], 1)}mg",
+                "sugar": f"{round(totals['sugar'], 1)}g"
+            },
+            "macronutrient_distribution": macro_percentages,
+            "food_breakdown": food_breakdown
+        }
+        
+        return dumps(meal_analysis)
+        
+    except httpx.HTTPStatusError as e:
+        return f"API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error analyzing meal: {str(e)}"
+
+
+def calculate_bmr(age: int, gender: str, weight_kg: float, height_cm: float) -> float:
+    """Calculate basal metabolic rate using the Mifflin-St Jeor equation."""
+    bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age)
+    return bmr + 5 if gender.lower() == "male" else bmr - 161
+
+
+def split_remaining_calories(total_calories: float, protein_grams: float) -> Tuple[float, float]:
+    """
+    Split a calorie budget into fat and carbohydrate grams.
+    
+    Fat gets 25% of the calories; carbohydrates get whatever protein and fat leave.
+    
+    Returns:
+        Tuple of (fat_grams, carb_grams)
+    """
+    fat_grams = (total_calories * 0.25) / 9
+    carb_grams = (total_calories - (protein_grams * 4) - (fat_grams * 9)) / 4
+    return fat_grams, carb_grams
+
+
+def format_macro_targets(total_calories: float, protein_grams: float, carb_grams: float,
+                         fat_grams: float) -> Dict[str, str]:
+    """Format macronutrient targets as grams plus their share of total calories."""
+    macros = (
+        ("protein", protein_grams, 4),
+        ("carbohydrates", carb_grams, 4),
+        ("fat", fat_grams, 9)
+    )
+    percent_per_kcal = 100 / total_calories
+    return {
+        name: f"{grams:.1f}g ({grams * kcal_per_gram * percent_per_kcal:.1f}%)"
+        for name, grams, kcal_per_gram in macros
+    }
+
+
+# Activity level multipliers applied to BMR
+ACTIVITY_MULTIPLIERS = MappingProxyType({
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very_active": 1.9
+})
+
+
+# Pure arithmetic on the inputs; typed=True keeps 80 and 80.0 apart since both are echoed back
+@lru_cache(maxsize=1024, typed=True)
+def build_daily_needs(age: int, gender: str, weight_kg: float, height_cm: float,
+                      activity_level: str) -> Dict[str, Any]:
+    """
+    Compute daily caloric and nutritional needs.
+    
+    The returned dict is shared between calls and must not be modified.
+    """
+    gender_key = gender.lower()
+    bmr = calculate_bmr(age, gender_key, weight_kg, height_cm)
+    multiplier = lookup(ACTIVITY_MULTIPLIERS, activity_level, 1.55)
+    daily_calories = bmr * multiplier
+    
+    # Calculate macronutrient needs
+    protein_grams = weight_kg * 0.8
+    fat_grams, carb_grams = split_remaining_calories(daily_calories, protein_grams)
+    
+    fiber_grams = 25 if gender_key == "female" else 38
+    
+    daily_needs = {
+        "personal_info": {
+            "age": age,
+            "gender": gender,
+            "weight_kg": weight_kg,
+            "height_cm": height_cm,
+            "activity_level": activity_level,
+            "bmr": round(bmr, 1)
+        },
+        "daily_caloric_needs": round(daily_calories, 0),
+        "macronutrient_targets": {
+            **format_macro_targets(daily_calories, protein_grams, carb_grams, fat_grams),
+            "fiber": f"{fiber_grams}g"
+        },
+        "other_recommendations": {
+            "water_liters": round((weight_kg * 35) / 1000, 1),
+            "sodium_max_mg": 2300,
+            "sugar_max_g": round(daily_calories * 0.1 / 4, 1)
+        }
+    }
+    
+    return daily_needs
 
 
 @mcp.tool()
@@ -391,56 +724,7 @@ async def calculate_daily_needs(age: int, gender: str, weight_kg: float, height_
         JSON string containing calculated daily nutritional needs
     """
     try:
-        # Calculate BMR using Mifflin-St Jeor Equation
-        if gender.lower() == "male":
-            bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age) + 5
-        else:
-            bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age) - 161
-        
-        activity_multipliers = {
-            "sedentary": 1.2,
-            "light": 1.375,
-            "moderate": 1.55,
-            "active": 1.725,
-            "very_active": 1.9
-        }
-        
-        multiplier = activity_multipliers.get(activity_level.lower(), 1.55)
-        daily_calories = bmr * multiplier
-        
-        # Calculate macronutrient needs
-        protein_grams = weight_kg * 0.8
-        fat_calories = daily_calories * 0.25
-        fat_grams = fat_calories / 9
-        carb_calories = daily_calories - (protein_grams * 4) - (fat_grams * 9)
-        carb_grams = carb_calories / 4
-        
-        fiber_grams = 25 if gender.lower() == "female" else 38
-        
-        daily_needs = {
-            "personal_info": {
-                "age": age,
-                "gender": gender,
-                "weight_kg": weight_kg,
-                "height_cm": height_cm,
-                "activity_level": activity_level,
-                "bmr": round(bmr, 1)
-            },
-            "daily_caloric_needs": round(daily_calories, 0),
-            "macronutrient_targets": {
-                "protein": f"{round(protein_grams, 1)}g ({round((protein_grams * 4 / daily_calories) * 100, 1)}%)",
-                "carbohydrates": f"{round(carb_grams, 1)}g ({round((carb_grams * 4 / daily_calories) * 100, 1)}%)",
-                "fat": f"{round(fat_grams, 1)}g ({round((fat_grams * 9 / daily_calories) * 100, 1)}%)",
-                "fiber": f"{fiber_grams}g"
-            },
-            "other_recommendations": {
-                "water_liters": round((weight_kg * 35) / 1000, 1),
-                "sodium_max_mg": 2300,
-                "sugar_max_g": round(daily_calories * 0.1 / 4, 1)
-            }
-        }
-        
-        return json.dumps(daily_needs, indent=2)
+        return dumps(build_daily_needs(age, gender, weight_kg, height_cm, activity_level))
         
     except Exception as e:
         return f"Error calculating daily needs: {str(e)}"
@@ -462,118 +746,157 @@ async def search_exercises(query: str, limit: int = 20) -> str:
     Returns:
         JSON string containing exercise search results
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{WGER_BASE_URL}/exercise/",
-                headers=get_wger_headers(),
+    try:
+        data = await wger_json(
+            "GET", "/exercise/",
+            params={
+                "search": query,
+                "limit": limit,
+                "language": 2  # English
+            }
+        )
+        
+        exercises = []
+        for exercise in data.get("results", []):
+            exercise_info = {
+                "id": exercise.get("id"),
+                "name": exercise.get("name"),
+                "description": strip_html(exercise.get("description")),
+                "category": exercise.get("category"),
+                "muscles": exercise.get("muscles", []),
+                "muscles_secondary": exercise.get("muscles_secondary", []),
+                "equipment": exercise.get("equipment", [])
+            }
+            exercises.append(exercise_info)
+        
+        results = {
+            "query": query,
+            "total_found": data.get("count", 0),
+            "exercises": exercises
+        }
+        
+        return dumps(results)
+        
+    except httpx.HTTPStatusError as e:
+        return f"WGER API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error searching exercises: {str(e)}"
+
+
+@mcp.tool()
+async def get_exercises_by_muscle(muscle_group: str, limit: int = 15) -> str:
+    """
+    Get exercises targeting specific muscle groups.
+    
+    Args:
+        muscle_group: Target muscle group (e.g., "chest", "legs", "back", "shoulders", "arms")
+        limit: Maximum number of exercises to return (default: 15)
+    
+    Returns:
+        JSON string containing exercises for the specified muscle group
+    """
+    muscle_ids = lookup(MUSCLE_IDS, muscle_group, ())
+    
+    if not muscle_ids:
+        available_groups = ", ".join(MUSCLE_IDS)
+        return f"Invalid muscle group. Available groups: {available_groups}"
+    
+    try:
+        exercises = []
+        
+        responses = await asyncio.gather(*(
+            wger_json(
+                "GET", "/exercise/",
                 params={
-                    "search": query,
-                    "limit": limit,
-                    "language": 2  # English
+                    "muscles": muscle_id,
+                    "limit": limit // len(muscle_ids),
+                    "language": 2
                 }
             )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            exercises = []
+            for muscle_id in muscle_ids
+        ))
+        
+        for data in responses:
             for exercise in data.get("results", []):
                 exercise_info = {
                     "id": exercise.get("id"),
                     "name": exercise.get("name"),
-                    "description": exercise.get("description", "").replace("<p>", "").replace("</p>", ""),
-                    "category": exercise.get("category"),
-                    "muscles": exercise.get("muscles", []),
-                    "muscles_secondary": exercise.get("muscles_secondary", []),
+                    "description": strip_html(exercise.get("description")),
+                    "primary_muscles": exercise.get("muscles", []),
+                    "secondary_muscles": exercise.get("muscles_secondary", []),
                     "equipment": exercise.get("equipment", [])
                 }
-                exercises.append(exercise_info)
-            
-            results = {
-                "query": query,
-                "total_found": data.get("count", 0),
-                "exercises": exercises
-            }
-            
-            return json.dumps(results, indent=2)
-            
-        except httpx.HTTPStatusError as e:
-            return f"WGER API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error searching exercises: {str(e)}"
+                exercises.append(exercise_info)
+        
+        results = {
+            "muscle_group": muscle_group,
+            "total_exercises": len(exercises),
+            "exercises": exercises[:limit]
+        }
+        
+        return dumps(results)
+        
+    except httpx.HTTPStatusError as e:
+        return f"WGER API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error getting exercises by muscle: {str(e)}"
 
 
-@mcp.tool()
-async def get_exercises_by_muscle(muscle_group: str, limit: int = 15) -> str:
+# WGER's equipment list (/equipment/) by lowercase name, plus a "bodyweight" alias
+EQUIPMENT_IDS = MappingProxyType({
+    "barbell": 1,
+    "sz-bar": 2,
+    "dumbbell": 3,
+    "gym mat": 4,
+    "swiss ball": 5,
+    "pull-up bar": 6,
+    "none (bodyweight exercise)": 7,
+    "bodyweight": 7,
+    "bench": 8,
+    "incline bench": 9,
+    "kettlebell": 10
+})
+
+# Equipment WGER added after EQUIPMENT_IDS was written, loaded once on first miss
+LIVE_EQUIPMENT_IDS: Dict[str, int] = {}
+EQUIPMENT_LOCK = asyncio.Lock()
+
+
+def match_equipment(equipment_ids: Mapping[str, int], name: str) -> Optional[int]:
+    """Find an equipment ID by exact lowercase name, then by partial name match."""
+    if name in equipment_ids:
+        return equipment_ids[name]
+    return next((equipment_id for known, equipment_id in equipment_ids.items() if name in known), None)
+
+
+async def get_equipment_id(equipment_name: str) -> Optional[int]:
     """
-    Get exercises targeting specific muscle groups.
+    Look up a WGER equipment ID by name, falling back to a partial name match.
+    
+    Known equipment is resolved from EQUIPMENT_IDS without a request; only
+    unknown names consult WGER's live equipment list.
     
     Args:
-        muscle_group: Target muscle group (e.g., "chest", "legs", "back", "shoulders", "arms")
-        limit: Maximum number of exercises to return (default: 15)
+        equipment_name: Equipment name as given by the user
     
     Returns:
-        JSON string containing exercises for the specified muscle group
+        The equipment ID, or None if no equipment matches
     """
-    # Muscle group mapping to WGER muscle IDs
-    muscle_mapping = {
-        "chest": [4],  # Chest
-        "back": [12, 13],  # Lats, Rhomboids
-        "shoulders": [2, 3],  # Anterior deltoid, Posterior deltoid
-        "arms": [1, 5, 8],  # Biceps, Triceps, Forearms
-        "legs": [10, 11, 7, 9],  # Quadriceps, Hamstrings, Glutes, Calves
-        "abs": [14, 6],  # Rectus abdominis, Obliques
-        "core": [14, 6]  # Same as abs
-    }
-    
-    muscle_ids = muscle_mapping.get(muscle_group.lower(), [])
+    name = equipment_name.lower()
+    equipment_id = match_equipment(EQUIPMENT_IDS, name)
+    if equipment_id is not None:
+        return equipment_id
     
-    if not muscle_ids:
-        available_groups = ", ".join(muscle_mapping.keys())
-        return f"Invalid muscle group. Available groups: {available_groups}"
+    async with EQUIPMENT_LOCK:
+        if not LIVE_EQUIPMENT_IDS:
+            data = await wger_json(
+                "GET", "/equipment/",
+                params={"limit": 200}
+            )
+            for equipment in data.get("results", []):
+                LIVE_EQUIPMENT_IDS.setdefault(equipment.get("name", "").lower(), equipment.get("id"))
     
-    async with httpx.AsyncClient() as client:
-        try:
-            exercises = []
-            
-            for muscle_id in muscle_ids:
-                response = await client.get(
-                    f"{WGER_BASE_URL}/exercise/",
-                    headers=get_wger_headers(),
-                    params={
-                        "muscles": muscle_id,
-                        "limit": limit // len(muscle_ids),
-                        "language": 2
-                    }
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                for exercise in data.get("results", []):
-                    exercise_info = {
-                        "id": exercise.get("id"),
-                        "name": exercise.get("name"),
-                        "description": exercise.get("description", "").replace("<p>", "").replace("</p>", ""),
-                        "primary_muscles": exercise.get("muscles", []),
-                        "secondary_muscles": exercise.get("muscles_secondary", []),
-                        "equipment": exercise.get("equipment", [])
-                    }
-                    exercises.append(exercise_info)
-            
-            results = {
-                "muscle_group": muscle_group,
-                "total_exercises": len(exercises),
-                "exercises": exercises[:limit]
-            }
-            
-            return json.dumps(results, indent=2)
-            
-        except httpx.HTTPStatusError as e:
-            return f"WGER API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error getting exercises by muscle: {str(e)}"
+    return match_equipment(LIVE_EQUIPMENT_IDS, name)
 
 
 @mcp.tool()
@@ -582,84 +905,52 @@ async def get_equipment_exercises(equipment_name: str, limit: int = 15) -> str:
     Get exercises that can be performed with specific equipment.
     
     Args:
-        equipment_name: Equipment type (e.g., "dumbbell", "barbell", "bodyweight", "machine")
+        equipment_name: Equipment type (e.g., "dumbbell", "barbell", "bodyweight", "kettlebell")
         limit: Maximum number of exercises to return (default: 15)
     
     Returns:
         JSON string containing exercises for the specified equipment
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            # First get equipment list to find the ID
-            equipment_response = await client.get(
-                f"{WGER_BASE_URL}/equipment/",
-                headers=get_wger_headers(),
-                params={"limit": 50}
-            )
-            equipment_response.raise_for_status()
-            
-            equipment_data = equipment_response.json()
-            equipment_id = None
-            
-            # Search for equipment by name
-            for equipment in equipment_data.get("results", []):
-                if equipment_name.lower() in equipment.get("name", "").lower():
-                    equipment_id = equipment.get("id")
-                    break
-            
-            if not equipment_id:
-                # Try some common mappings
-                equipment_mapping = {
-                    "dumbbell": 1,
-                    "barbell": 2,
-                    "bodyweight": 7,
-                    "machine": 3,
-                    "cable": 4,
-                    "kettlebell": 9
-                }
-                equipment_id = equipment_mapping.get(equipment_name.lower())
-            
-            if not equipment_id:
-                return f"Equipment '{equipment_name}' not found. Try: dumbbell, barbell, bodyweight, machine, cable, kettlebell"
-            
-            # Get exercises for this equipment
-            response = await client.get(
-                f"{WGER_BASE_URL}/exercise/",
-                headers=get_wger_headers(),
-                params={
-                    "equipment": equipment_id,
-                    "limit": limit,
-                    "language": 2
-                }
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            exercises = []
-            for exercise in data.get("results", []):
-                exercise_info = {
-                    "id": exercise.get("id"),
-                    "name": exercise.get("name"),
-                    "description": exercise.get("description", "").replace("<p>", "").replace("</p>", ""),
-                    "primary_muscles": exercise.get("muscles", []),
-                    "secondary_muscles": exercise.get("muscles_secondary", []),
-                    "equipment": exercise.get("equipment", [])
-                }
-                exercises.append(exercise_info)
-            
-            results = {
-                "equipment": equipment_name,
-                "total_exercises": len(exercises),
-                "exercises": exercises
+    try:
+        equipment_id = await get_equipment_id(equipment_name)
+        
+        if not equipment_id:
+            return f"Equipment '{equipment_name}' not found. Try: dumbbell, barbell, bodyweight, kettlebell, bench, pull-up bar"
+        
+        # Get exercises for this equipment
+        data = await wger_json(
+            "GET", "/exercise/",
+            params={
+                "equipment": equipment_id,
+                "limit": limit,
+                "language": 2
             }
-            
-            return json.dumps(results, indent=2)
-            
-        except httpx.HTTPStatusError as e:
-            return f"WGER API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error getting equipment exercises: {str(e)}"
+        )
+        
+        exercises = []
+        for exercise in data.get("results", []):
+            exercise_info = {
+                "id": exercise.get("id"),
+                "name": exercise.get("name"),
+                "description": strip_html(exercise.get("description")),
+                "primary_muscles": exercise.get("muscles", []),
+                "secondary_muscles": exercise.get("muscles_secondary", []),
+                "equipment": exercise.get("equipment", [])
+            }
+            exercises.append(exercise_info)
+        
+        results = {
+            "equipment": equipment_name,
+            "total_exercises": len(exercises),
+            "exercises": exercises
+        }
+        
+        return dumps(results)
+        
+    except httpx.HTTPStatusError as e:
+        return f"WGER API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error getting equipment exercises: {str(e)}"
 
 
 @mcp.tool()
@@ -673,40 +964,35 @@ async def get_workout_templates(difficulty: str = "intermediate") -> str:
     Returns:
         JSON string containing workout templates
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{WGER_BASE_URL}/workout/",
-                headers=get_wger_headers(),
-                params={"limit": 20}
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            workouts = []
-            for workout in data.get("results", []):
-                # Get workout details
-                workout_info = {
-                    "id": workout.get("id"),
-                    "name": workout.get("name", f"Workout {workout.get('id')}"),
-                    "creation_date": workout.get("creation_date"),
-                    "description": workout.get("comment", "")
-                }
-                workouts.append(workout_info)
-            
-            results = {
-                "difficulty": difficulty,
-                "available_workouts": len(workouts),
-                "workouts": workouts
+    try:
+        data = await wger_json(
+            "GET", "/workout/",
+            params={"limit": 20}
+        )
+        
+        workouts = []
+        for workout in data.get("results", []):
+            # Get workout details
+            workout_info = {
+                "id": workout.get("id"),
+                "name": workout.get("name", f"Workout {workout.get('id')}"),
+                "creation_date": workout.get("creation_date"),
+                "description": workout.get("comment", "")
             }
-            
-            return json.dumps(results, indent=2)
-            
-        except httpx.HTTPStatusError as e:
-            return f"WGER API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error getting workout templates: {str(e)}"
+            workouts.append(workout_info)
+        
+        results = {
+            "difficulty": difficulty,
+            "available_workouts": len(workouts),
+            "workouts": workouts
+        }
+        
+        return dumps(results)
+        
+    except httpx.HTTPStatusError as e:
+        return f"WGER API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error getting workout templates: {str(e)}"
 
 
 @mcp.tool()
@@ -727,52 +1013,256 @@ async def calculate_exercise_calories(exercise_name: str, duration_min: int = 30
     else:
         query = exercise_name
     
-    async with httpx.AsyncClient() as client:
+    try:
+        payload = {"query": query}
+        if weight_kg:
+            payload["weight_kg"] = weight_kg
+        
+        data = await nutritionix_json(
+            "POST", "/natural/exercise",
+            json=payload
+        )
+        
+        if "exercises" not in data or not data["exercises"]:
+            return f"No exercise information found for: {query}"
+        
+        exercises = data["exercises"]
+        results = {
+            "query": query,
+            "total_calories_burned": math.fsum(exercise.get("nf_calories") or 0 for exercise in exercises),
+            "exercises": [
+                {
+                    "name": exercise.get("name"),
+                    "duration_min": exercise.get("duration_min"),
+                    "met": exercise.get("met"),
+                    "nf_calories": exercise.get("nf_calories"),
+                    "user_weight_kg": exercise.get("user_weight_kg")
+                }
+                for exercise in exercises
+            ]
+        }
+        
+        return dumps(results)
+        
+    except httpx.HTTPStatusError as e:
+        return f"API Error: {e.response.status_code} - {e.response.text}"
+    except Exception as e:
+        return f"Error calculating exercise calories: {str(e)}"
+
+
+# =============================================================================
+# COMBINED FUNCTIONALITY ENDPOINTS
+# =============================================================================
+
+async def load_plan_exercises(per_muscle: int = 3) -> Tuple[Dict[str, List[Dict[str, Any]]], Tuple[str, ...]]:
+    """
+    Fetch a few WGER exercises for each muscle group used in fitness plans.
+    
+    Summaries are cached per muscle for EXERCISE_CACHE_TTL seconds. Uncached groups
+    are requested in one batched query; any group the batch leaves empty is
+    topped up with concurrent single-muscle requests. Use fetch_plan_exercises,
+    which shares one in-flight load between concurrent plans.
+    
+    Args:
+        per_muscle: Number of exercises to keep per muscle group (default: 3)
+    
+    Returns:
+        Dict mapping muscle group names to short exercise summaries, and the groups
+        whose requests failed (as opposed to WGER simply having no exercises for them)
+    """
+    primary_ids = {muscle: MUSCLE_IDS[muscle][0] for muscle in PLAN_MUSCLE_GROUPS}
+    summaries: Dict[str, Tuple[Dict[str, str], ...]] = {}
+    failed: List[str] = []
+    
+    now = time.monotonic()
+    for muscle, muscle_id in primary_ids.items():
+        cached = EXERCISE_CACHE.get((muscle_id, per_muscle))
+        if cached and cached[0] > now:
+            summaries[muscle] = cached[1]
+    
+    pending = [muscle for muscle in primary_ids if muscle not in summaries]
+    if pending:
+        found: Dict[str, List[Dict[str, Any]]] = {muscle: [] for muscle in pending}
+        
         try:
-            payload = {"query": query}
-            if weight_kg:
-                payload["weight_kg"] = weight_kg
-            
-            response = await client.post(
-                f"{NUTRITIONIX_BASE_URL}/natural/exercise",
-                headers=get_nutritionix_headers(),
-                json=payload
+            response = await wger_request(
+                "GET", "/exercise/",
+                params={
+                    "muscles__in": ",".join(str(primary_ids[muscle]) for muscle in pending),
+                    "limit": per_muscle * len(pending) * 4,
+                    "language": 2
+                }
             )
             response.raise_for_status()
             
-            data = response.json()
-            
-            if "exercises" not in data or not data["exercises"]:
-                return f"No exercise information found for: {query}"
-            
-            results = {
-                "query": query,
-                "total_calories_burned": 0,
-                "exercises": []
-            }
-            
-            for exercise_data in data["exercises"]:
-                exercise_info = {
-                    "name": exercise_data.get("name"),
-                    "duration_min": exercise_data.get("duration_min"),
-                    "met": exercise_data.get("met"),
-                    "nf_calories": exercise_data.get("nf_calories"),
-                    "user_weight_kg": exercise_data.get("user_weight_kg")
-                }
-                results["exercises"].append(exercise_info)
-                results["total_calories_burned"] += exercise_data.get("nf_calories", 0)
+            for ex in loads(response.content).get("results", []):
+                ex_muscles = ex.get("muscles", [])
+                for muscle in pending:
+                    if primary_ids[muscle] in ex_muscles and len(found[muscle]) < per_muscle:
+                        found[muscle].append(ex)
+        except httpx.HTTPError:
+            # The per-muscle requests below cover every group
+            pass
+        
+        missing = [muscle for muscle in pending if not found[muscle]]
+        if missing:
+            responses = await asyncio.gather(
+                *(
+                    wger_request(
+                        "GET", "/exercise/",
+                        params={
+                            "muscles": primary_ids[muscle],
+                            "limit": per_muscle,
+                            "language": 2
+                        }
+                    )
+                    for muscle in missing
+                ),
+                return_exceptions=True
+            )
             
-            return json.dumps(results, indent=2)
+            for muscle, response in zip(missing, responses):
+                # A failed request only drops that muscle group
+                if isinstance(response, BaseException) or response.status_code != 200:
+                    failed.append(muscle)
+                    continue
+                found[muscle] = loads(response.content).get("results", [])[:per_muscle]
             
-        except httpx.HTTPStatusError as e:
-            return f"API Error: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Error calculating exercise calories: {str(e)}"
+            # Only give up when nothing at all could be fetched
+            errors = [r for r in responses if isinstance(r, BaseException)]
+            if errors and not summaries and not any(found.values()):
+                raise errors[0]
+        
+        expires = time.monotonic() + EXERCISE_CACHE_TTL
+        for muscle in pending:
+            if found[muscle]:
+                # Only the first 100 characters are shown, so don't strip tags from the rest
+                summaries[muscle] = tuple(
+                    {
+                        "name": ex.get("name"),
+                        "description": strip_html((ex.get("description") or "")[:400])[:100] + "..."
+                    }
+                    for ex in found[muscle]
+                )
+                EXERCISE_CACHE[(primary_ids[muscle], per_muscle)] = (expires, summaries[muscle])
 
+    return {muscle: list(summaries[muscle]) for muscle in primary_ids if muscle in summaries}, tuple(failed)
+
+
+def fetch_plan_exercises(per_muscle: int = 3) -> "asyncio.Task[Any]":
+    """
+    Start loading plan exercises, or join the load already in flight.
+    
+    Concurrent plans await the same task and get its result or its exception, so an
+    unreachable WGER is tried once per burst of plans instead of once per plan.
+    The task is created before this returns, so a caller that yields once has
+    already sent the first request. The shared result must not be modified.
+    """
+    task = EXERCISE_FETCHES.get(per_muscle)
+    if task is None:
+        task = asyncio.create_task(load_plan_exercises(per_muscle))
+        EXERCISE_FETCHES[per_muscle] = task
+        
+        def forget(done: "asyncio.Task[Any]") -> None:
+            del EXERCISE_FETCHES[per_muscle]
+            # Plans that gave up no longer await the task, so retrieve its error here
+            if not done.cancelled():
+                done.exception()
+        
+        task.add_done_callback(forget)
+    return task
+
+
+# Per-goal parameters: (daily calorie adjustment, protein g per kg, ideal weekly weight change in kg).
+# Unknown goals are treated as "maintain".
+GOAL_PROFILES = MappingProxyType({
+    "lose_weight": (-500, 1.2, -0.5),  # 500 calorie deficit, moderate protein
+    "gain_muscle": (+300, 1.6, 0.25),  # 300 calorie surplus, higher protein
+    "maintain": (0, 1.0, 0),
+    "athletic_performance": (+200, 1.0, 0)
+})
+
+# Equipment availability mapped to the WGER equipment type used for plans
+PLAN_EQUIPMENT_TYPES = MappingProxyType({
+    "gym": "barbell",
+    "home": "dumbbell",
+    "bodyweight": "bodyweight",
+    "minimal": "bodyweight"
+})
+
+# Bodyweight exercises used when WGER cannot be reached
+FALLBACK_WORKOUT_STRUCTURE = MappingProxyType({
+    "chest": [{"name": "Push-ups", "description": "Classic bodyweight chest exercise"}],
+    "back": [{"name": "Pull-ups", "description": "Upper body pulling exercise"}],
+    "legs": [{"name": "Squats", "description": "Fundamental lower body exercise"}],
+    "shoulders": [{"name": "Pike Push-ups", "description": "Bodyweight shoulder exercise"}],
+    "arms": [{"name": "Tricep Dips", "description": "Bodyweight arm exercise"}]
+})
+
+# Static parts of the sample meal plan
+SAMPLE_BREAKFAST = ("3 eggs scrambled", "2 slices whole wheat toast", "1 medium banana", "1 cup coffee")
+SAMPLE_LUNCH_SIDES = ("1 cup brown rice", "1 cup steamed vegetables", "1 tbsp olive oil")
+SAMPLE_DINNER_SIDES = ("1 cup quinoa", "Mixed green salad", "1 tbsp dressing")
+SAMPLE_SNACKS = ("1 cup greek yogurt", "1/4 cup nuts", "1 apple with 2 tbsp peanut butter")
+
+
+@lru_cache(maxsize=64)
+def build_sample_meals(protein_portion: float) -> Dict[str, Tuple[str, ...]]:
+    """
+    Build the sample meal plan for a protein portion in grams.
+    
+    Only the lunch and dinner protein portions vary, and they are already
+    rounded to whole grams, so plans for similar body weights share one entry.
+    The returned dict is shared between calls and must not be modified.
+    """
+    return {
+        "breakfast": SAMPLE_BREAKFAST,
+        "lunch": (f"{protein_portion}g grilled chicken breast", *SAMPLE_LUNCH_SIDES),
+        "dinner": (f"{protein_portion}g lean protein (fish/meat)", *SAMPLE_DINNER_SIDES),
+        "snacks": SAMPLE_SNACKS
+    }
+
+
+# General training advice included in every fitness plan
+TRAINING_GUIDELINES = (
+    "Warm up 5-10 minutes before each workout",
+    "Cool down and stretch after each workout",
+    "Rest 48-72 hours between training the same muscle group",
+    "Progressive overload: gradually increase weight/reps/sets",
+    "Listen to your body and rest when needed"
+)
+
+# Metrics suggested for tracking plan progress
+RECOMMENDED_METRICS = (
+    "Daily weight (same time each day)",
+    "Weekly body measurements",
+    "Workout performance (weights, reps, sets)",
+    "Energy levels (1-10 scale)",
+    "Sleep quality (hours and quality)"
+)
+
+# Progress tracking section of a fitness plan, prebuilt per goal
+PROGRESS_TRACKING = MappingProxyType({
+    goal: {
+        "weekly_goals": {
+            "weight_change": weight_change,
+            "strength": "Increase weights by 2.5-5% when you can complete all sets with good form",
+            "measurements": "Track waist, chest, arms, thighs weekly"
+        },
+        "recommended_metrics": RECOMMENDED_METRICS
+    }
+    for goal, weight_change in (
+        ("lose_weight", "0.5-1kg per week"),
+        ("gain_muscle", "0.25-0.5kg per week"),
+        ("maintain", "maintain current weight")
+    )
+})
+
+# Finished plans keyed on the tool arguments, kept as long as their exercise data
+PLAN_CACHE_TTL = EXERCISE_CACHE_TTL
+PLAN_CACHE_MAXSIZE = 256
+PLAN_CACHE: Dict[Tuple[Any, ...], Tuple[float, str]] = {}
 
-# =============================================================================
-# COMBINED FUNCTIONALITY ENDPOINTS
-# =============================================================================
 
 @mcp.tool()
 async def create_fitness_plan(age: int, gender: str, weight_kg: float, height_cm: float, 
@@ -794,129 +1284,54 @@ async def create_fitness_plan(age: int, gender: str, weight_kg: float, height_cm
     Returns:
         JSON string containing comprehensive fitness plan
     """
+    plan_key = (age, gender, weight_kg, height_cm, goal, activity_level, workout_days, equipment)
+    cached = PLAN_CACHE.get(plan_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    exercise_task = None
+    
     try:
-        # Calculate daily nutritional needs
-        if gender.lower() == "male":
-            bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age) + 5
-        else:
-            bmr = (10 * weight_kg) + (6.25 * height_cm) - (5 * age) - 161
-        
-        activity_multipliers = {
-            "sedentary": 1.2,
-            "light": 1.375,
-            "moderate": 1.55,
-            "active": 1.725,
-            "very_active": 1.9
-        }
+        # Bodyweight plans use the built-in exercises, so only gym and home plans need WGER.
+        # Start that lookup first and yield once so the request is sent before the
+        # nutrition work below, which then overlaps the round trip.
+        equipment_type = lookup(PLAN_EQUIPMENT_TYPES, equipment, "bodyweight")
+        if equipment_type != "bodyweight":
+            exercise_task = fetch_plan_exercises()
+            await asyncio.sleep(0)
         
-        multiplier = activity_multipliers.get(activity_level.lower(), 1.55)
+        # Calculate daily nutritional needs
+        bmr = calculate_bmr(age, gender, weight_kg, height_cm)
+        multiplier = lookup(ACTIVITY_MULTIPLIERS, activity_level, 1.55)
         maintenance_calories = bmr * multiplier
         
-        # Adjust calories based on goal
-        goal_adjustments = {
-            "lose_weight": -500,  # 500 calorie deficit
-            "gain_muscle": +300,  # 300 calorie surplus
-            "maintain": 0,
-            "athletic_performance": +200
-        }
-        
-        target_calories = maintenance_calories + goal_adjustments.get(goal, 0)
-        
-        # Calculate macronutrients based on goal
-        if goal == "gain_muscle":
-            protein_per_kg = 1.6  # Higher protein for muscle gain
-        elif goal == "lose_weight":
-            protein_per_kg = 1.2  # Moderate protein for weight loss
-        else:
-            protein_per_kg = 1.0
-        
+        # Adjust calories and macronutrients based on goal
+        calorie_adjustment, protein_per_kg, _ = GOAL_PROFILES.get(goal, GOAL_PROFILES["maintain"])
+        target_calories = maintenance_calories + calorie_adjustment
         protein_grams = weight_kg * protein_per_kg
-        fat_grams = (target_calories * 0.25) / 9  # 25% of calories from fat
-        carb_grams = (target_calories - (protein_grams * 4) - (fat_grams * 9)) / 4
-        
-        # Create workout recommendations based on equipment
-        equipment_mapping = {
-            "gym": "barbell",
-            "home": "dumbbell", 
-            "bodyweight": "bodyweight",
-            "minimal": "bodyweight"
-        }
+        fat_grams, carb_grams = split_remaining_calories(target_calories, protein_grams)
+        macro_targets = format_macro_targets(target_calories, protein_grams, carb_grams, fat_grams)
         
-        equipment_type = equipment_mapping.get(equipment.lower(), "bodyweight")
+        # Create sample meal plan
+        sample_meals = build_sample_meals(round(protein_grams/4, 0))
         
         # Get exercise recommendations
-        async with httpx.AsyncClient() as client:
+        wger_failed = False
+        if exercise_task is None:
+            workout_structure = FALLBACK_WORKOUT_STRUCTURE
+        else:
             try:
-                # Get exercises for different muscle groups
-                muscle_groups = ["chest", "back", "legs", "shoulders", "arms"]
-                workout_structure = {}
-                
-                for muscle in muscle_groups:
-                    muscle_ids = {
-                        "chest": [4],
-                        "back": [12, 13],
-                        "legs": [10, 11, 7, 9],
-                        "shoulders": [2, 3],
-                        "arms": [1, 5, 8]
-                    }.get(muscle, [])
-                    
-                    if muscle_ids:
-                        response = await client.get(
-                            f"{WGER_BASE_URL}/exercise/",
-                            headers=get_wger_headers(),
-                            params={
-                                "muscles": muscle_ids[0],
-                                "limit": 3,
-                                "language": 2
-                            }
-                        )
-                        
-                        if response.status_code == 200:
-                            data = response.json()
-                            exercises = []
-                            for ex in data.get("results", [])[:3]:
-                                exercises.append({
-                                    "name": ex.get("name"),
-                                    "description": ex.get("description", "").replace("<p>", "").replace("</p>", "")[:100] + "..."
-                                })
-                            workout_structure[muscle] = exercises
+                # Shielded so a cancelled plan doesn't cancel the load other plans share
+                workout_structure, failed_groups = await asyncio.shield(exercise_task)
+                # Groups dropped on error responses leave a partial plan that must not be cached
+                wger_failed = bool(failed_groups)
+                if not workout_structure:
+                    workout_structure = FALLBACK_WORKOUT_STRUCTURE
                 
-            except:
-                # Fallback workout structure
-                workout_structure = {
-                    "chest": [{"name": "Push-ups", "description": "Classic bodyweight chest exercise"}],
-                    "back": [{"name": "Pull-ups", "description": "Upper body pulling exercise"}],
-                    "legs": [{"name": "Squats", "description": "Fundamental lower body exercise"}],
-                    "shoulders": [{"name": "Pike Push-ups", "description": "Bodyweight shoulder exercise"}],
-                    "arms": [{"name": "Tricep Dips", "description": "Bodyweight arm exercise"}]
-                }
-        
-        # Create sample meal plan
-        sample_meals = {
-            "breakfast": [
-                "3 eggs scrambled",
-                "2 slices whole wheat toast", 
-                "1 medium banana",
-                "1 cup coffee"
-            ],
-            "lunch": [
-                f"{round(protein_grams/4, 0)}g grilled chicken breast",
-                "1 cup brown rice",
-                "1 cup steamed vegetables",
-                "1 tbsp olive oil"
-            ],
-            "dinner": [
-                f"{round(protein_grams/4, 0)}g lean protein (fish/meat)",
-                "1 cup quinoa",
-                "Mixed green salad",
-                "1 tbsp dressing"
-            ],
-            "snacks": [
-                "1 cup greek yogurt",
-                "1/4 cup nuts",
-                "1 apple with 2 tbsp peanut butter"
-            ]
-        }
+            except (httpx.HTTPError, asyncio.TimeoutError, ValueError):
+                # WGER unavailable or returned garbage, use the bodyweight plan
+                workout_structure = FALLBACK_WORKOUT_STRUCTURE
+                wger_failed = True
         
         # Create weekly workout split
         if workout_days >= 4:
@@ -949,13 +1364,9 @@ async def create_fitness_plan(age: int, gender: str, weight_kg: float, height_cm
                 "daily_calories": {
                     "maintenance": round(maintenance_calories, 0),
                     "target": round(target_calories, 0),
-                    "adjustment": goal_adjustments.get(goal, 0)
-                },
-                "macronutrient_targets": {
-                    "protein": f"{round(protein_grams, 1)}g ({round((protein_grams * 4 / target_calories) * 100, 1)}%)",
-                    "carbohydrates": f"{round(carb_grams, 1)}g ({round((carb_grams * 4 / target_calories) * 100, 1)}%)",
-                    "fat": f"{round(fat_grams, 1)}g ({round((fat_grams * 9 / target_calories) * 100, 1)}%)"
+                    "adjustment": calorie_adjustment
                 },
+                "macronutrient_targets": macro_targets,
                 "sample_meal_plan": sample_meals,
                 "hydration": f"{round((weight_kg * 35) / 1000, 1)} liters water daily"
             },
@@ -963,36 +1374,122 @@ async def create_fitness_plan(age: int, gender: str, weight_kg: float, height_cm
                 "frequency": f"{workout_days} days per week",
                 "equipment": equipment,
                 "weekly_split": workout_split,
-                "general_guidelines": [
-                    "Warm up 5-10 minutes before each workout",
-                    "Cool down and stretch after each workout",
-                    "Rest 48-72 hours between training the same muscle group",
-                    "Progressive overload: gradually increase weight/reps/sets",
-                    "Listen to your body and rest when needed"
-                ]
+                "general_guidelines": TRAINING_GUIDELINES
             },
-            "progress_tracking": {
-                "weekly_goals": {
-                    "weight_change": "0.5-1kg per week" if goal == "lose_weight" else "0.25-0.5kg per week" if goal == "gain_muscle" else "maintain current weight",
-                    "strength": "Increase weights by 2.5-5% when you can complete all sets with good form",
-                    "measurements": "Track waist, chest, arms, thighs weekly"
-                },
-                "recommended_metrics": [
-                    "Daily weight (same time each day)",
-                    "Weekly body measurements",
-                    "Workout performance (weights, reps, sets)",
-                    "Energy levels (1-10 scale)",
-                    "Sleep quality (hours and quality)"
-                ]
-            }
+            "progress_tracking": PROGRESS_TRACKING.get(goal, PROGRESS_TRACKING["maintain"])
         }
         
-        return json.dumps(fitness_plan, indent=2)
+        result = dumps(fitness_plan)
+        
+        # Plans that fell back because WGER failed are retried once it is back
+        if not wger_failed:
+            if len(PLAN_CACHE) >= PLAN_CACHE_MAXSIZE:
+                PLAN_CACHE.pop(next(iter(PLAN_CACHE)))
+            PLAN_CACHE[plan_key] = (time.monotonic() + PLAN_CACHE_TTL, result)
+        
+        return result
         
     except Exception as e:
         return f"Error creating fitness plan: {str(e)}"
 
 
+# Approximate MET values per workout type
+MET_VALUES = MappingProxyType({
+    "strength": 6.0,
+    "cardio": 8.0,
+    "mixed": 7.0,
+    "hiit": 10.0
+})
+
+# Pre and post-workout calorie targets per goal (default: maintain, 150/200)
+WORKOUT_MEAL_CALORIES = MappingProxyType({
+    "lose_weight": (100, 150),
+    "gain_muscle": (200, 300),
+    "endurance": (250, 200)
+})
+
+# Pre-workout meal suggestions (1-2 hours before)
+PRE_WORKOUT_OPTIONS = MappingProxyType({
+    "strength": (
+        {
+            "meal": "Banana with almond butter",
+            "foods": ("1 medium banana", "2 tbsp almond butter"),
+            "timing": "30-60 minutes before",
+            "benefits": "Quick carbs for energy, healthy fats for sustained energy"
+        },
+        {
+            "meal": "Oatmeal with berries",
+            "foods": ("1/2 cup oats", "1/2 cup berries", "1 tbsp honey"),
+            "timing": "1-2 hours before",
+            "benefits": "Complex carbs for sustained energy"
+        }
+    ),
+    "cardio": (
+        {
+            "meal": "Toast with jam",
+            "foods": ("1 slice whole wheat bread", "1 tbsp jam"),
+            "timing": "30-45 minutes before",
+            "benefits": "Quick carbs for immediate energy"
+        },
+        {
+            "meal": "Greek yogurt with fruit",
+            "foods": ("1 cup greek yogurt", "1/2 cup berries"),
+            "timing": "1-2 hours before",
+            "benefits": "Protein + carbs for energy and muscle protection"
+        }
+    )
+})
+
+# Post-workout meal suggestions (within 30-60 minutes)
+POST_WORKOUT_OPTIONS = MappingProxyType({
+    "strength": (
+        {
+            "meal": "Protein shake with banana",
+            "foods": ("1 scoop whey protein", "1 medium banana", "1 cup milk"),
+            "timing": "Within 30 minutes",
+            "benefits": "Fast protein for muscle recovery, carbs to replenish glycogen"
+        },
+        {
+            "meal": "Chicken and rice bowl",
+            "foods": ("100g grilled chicken", "1/2 cup cooked rice", "vegetables"),
+            "timing": "Within 60 minutes",
+            "benefits": "Complete protein and carbs for recovery"
+        }
+    ),
+    "cardio": (
+        {
+            "meal": "Chocolate milk",
+            "foods": ("1 cup low-fat chocolate milk",),
+            "timing": "Within 30 minutes",
+            "benefits": "3:1 carb to protein ratio ideal for recovery"
+        },
+        {
+            "meal": "Tuna sandwich",
+            "foods": ("2 slices whole wheat bread", "1 can tuna", "vegetables"),
+            "timing": "Within 60 minutes",
+            "benefits": "Lean protein and complex carbs"
+        }
+    )
+})
+
+# General advice for eating before and after a workout
+PRE_WORKOUT_GUIDELINES = (
+    "Eat 1-3 hours before workout",
+    "Focus on carbohydrates for energy",
+    "Include some protein if eating 2+ hours before",
+    "Avoid high fat and fiber foods close to workout",
+    "Stay hydrated"
+)
+
+POST_WORKOUT_GUIDELINES = (
+    "Eat within 30-60 minutes after workout",
+    "Include both protein and carbohydrates",
+    "Aim for 3:1 or 4:1 carb to protein ratio",
+    "Rehydrate with water or electrolyte drinks",
+    "Include anti-inflammatory foods"
+)
+
+
 @mcp.tool()
 async def suggest_pre_post_workout_meals(workout_type: str, duration_min: int = 60, 
                                        weight_kg: float = 70, goal: str = "maintain") -> str:
@@ -1010,97 +1507,17 @@ async def suggest_pre_post_workout_meals(workout_type: str, duration_min: int =
     """
     try:
         # Calculate approximate calories burned based on workout type
-        met_values = {
-            "strength": 6.0,
-            "cardio": 8.0,
-            "mixed": 7.0,
-            "hiit": 10.0
-        }
-        
-        met = met_values.get(workout_type.lower(), 7.0)
+        met = lookup(MET_VALUES, workout_type, 7.0)
         calories_burned = (met * weight_kg * (duration_min / 60))
         
         # Adjust recommendations based on goal
-        if goal == "lose_weight":
-            pre_workout_calories = 100
-            post_workout_calories = 150
-        elif goal == "gain_muscle":
-            pre_workout_calories = 200
-            post_workout_calories = 300
-        elif goal == "endurance":
-            pre_workout_calories = 250
-            post_workout_calories = 200
-        else:  # maintain
-            pre_workout_calories = 150
-            post_workout_calories = 200
+        pre_workout_calories, post_workout_calories = WORKOUT_MEAL_CALORIES.get(goal, (150, 200))
         
         # Pre-workout meal suggestions (1-2 hours before)
-        pre_workout_options = {
-            "strength": [
-                {
-                    "meal": "Banana with almond butter",
-                    "foods": ["1 medium banana", "2 tbsp almond butter"],
-                    "timing": "30-60 minutes before",
-                    "benefits": "Quick carbs for energy, healthy fats for sustained energy"
-                },
-                {
-                    "meal": "Oatmeal with berries",
-                    "foods": ["1/2 cup oats", "1/2 cup berries", "1 tbsp honey"],
-                    "timing": "1-2 hours before",
-                    "benefits": "Complex carbs for sustained energy"
-                }
-            ],
-            "cardio": [
-                {
-                    "meal": "Toast with jam",
-                    "foods": ["1 slice whole wheat bread", "1 tbsp jam"],
-                    "timing": "30-45 minutes before",
-                    "benefits": "Quick carbs for immediate energy"
-                },
-                {
-                    "meal": "Greek yogurt with fruit",
-                    "foods": ["1 cup greek yogurt", "1/2 cup berries"],
-                    "timing": "1-2 hours before",
-                    "benefits": "Protein + carbs for energy and muscle protection"
-                }
-            ]
-        }
-        
         # Post-workout meal suggestions (within 30-60 minutes)
-        post_workout_options = {
-            "strength": [
-                {
-                    "meal": "Protein shake with banana",
-                    "foods": ["1 scoop whey protein", "1 medium banana", "1 cup milk"],
-                    "timing": "Within 30 minutes",
-                    "benefits": "Fast protein for muscle recovery, carbs to replenish glycogen"
-                },
-                {
-                    "meal": "Chicken and rice bowl",
-                    "foods": ["100g grilled chicken", "1/2 cup cooked rice", "vegetables"],
-                    "timing": "Within 60 minutes",
-                    "benefits": "Complete protein and carbs for recovery"
-                }
-            ],
-            "cardio": [
-                {
-                    "meal": "Chocolate milk",
-                    "foods": ["1 cup low-fat chocolate milk"],
-                    "timing": "Within 30 minutes",
-                    "benefits": "3:1 carb to protein ratio ideal for recovery"
-                },
-                {
-                    "meal": "Tuna sandwich",
-                    "foods": ["2 slices whole wheat bread", "1 can tuna", "vegetables"],
-                    "timing": "Within 60 minutes",
-                    "benefits": "Lean protein and complex carbs"
-                }
-            ]
-        }
-        
         # Get specific recommendations for workout type
-        pre_options = pre_workout_options.get(workout_type.lower(), pre_workout_options["strength"])
-        post_options = post_workout_options.get(workout_type.lower(), post_workout_options["strength"])
+        pre_options = lookup(PRE_WORKOUT_OPTIONS, workout_type, PRE_WORKOUT_OPTIONS["strength"])
+        post_options = lookup(POST_WORKOUT_OPTIONS, workout_type, POST_WORKOUT_OPTIONS["strength"])
         
         recommendations = {
             "workout_info": {
@@ -1112,24 +1529,12 @@ async def suggest_pre_post_workout_meals(workout_type: str, duration_min: int =
             },
             "pre_workout": {
                 "target_calories": pre_workout_calories,
-                "general_guidelines": [
-                    "Eat 1-3 hours before workout",
-                    "Focus on carbohydrates for energy",
-                    "Include some protein if eating 2+ hours before",
-                    "Avoid high fat and fiber foods close to workout",
-                    "Stay hydrated"
-                ],
+                "general_guidelines": PRE_WORKOUT_GUIDELINES,
                 "meal_options": pre_options
             },
             "post_workout": {
                 "target_calories": post_workout_calories,
-                "general_guidelines": [
-                    "Eat within 30-60 minutes after workout",
-                    "Include both protein and carbohydrates",
-                    "Aim for 3:1 or 4:1 carb to protein ratio",
-                    "Rehydrate with water or electrolyte drinks",
-                    "Include anti-inflammatory foods"
-                ],
+                "general_guidelines": POST_WORKOUT_GUIDELINES,
                 "meal_options": post_options
             },
             "hydration_strategy": {
@@ -1139,12 +1544,22 @@ async def suggest_pre_post_workout_meals(workout_type: str, duration_min: int =
             }
         }
         
-        return json.dumps(recommendations, indent=2)
+        return dumps(recommendations)
         
     except Exception as e:
         return f"Error suggesting workout meals: {str(e)}"
 
 
+# Habits to focus on each week while tracking progress
+WEEKLY_FOCUS_AREAS = (
+    "Maintain consistent workout schedule",
+    "Track food intake accurately",
+    "Get adequate sleep (7-9 hours)",
+    "Stay hydrated",
+    "Monitor energy levels"
+)
+
+
 @mcp.tool()
 async def track_weekly_progress(current_weight: float, target_weight: float, 
                                weekly_workouts_completed: int, goal: str = "lose_weight") -> str:
@@ -1162,19 +1577,20 @@ async def track_weekly_progress(current_weight: float, target_weight: float,
     """
     try:
         weight_difference = current_weight - target_weight
+        _, _, weekly_change = GOAL_PROFILES.get(goal, GOAL_PROFILES["maintain"])
+        
+        # Weeks needed at the ideal rate, if the goal still moves weight toward the target
+        weeks_at_ideal_rate = -weight_difference / weekly_change if weekly_change else 0
+        # Round up to whole weeks, ignoring float noise such as 3.0000000000000284
+        weeks_to_goal = math.ceil(round(weeks_at_ideal_rate, 6)) if weeks_at_ideal_rate > 0 else 0
         
         # Determine if progress is on track
         if goal == "lose_weight":
-            ideal_weekly_loss = 0.5  # kg per week
             progress_status = "On track" if abs(weight_difference) > 0 else "Target reached"
-            weeks_to_goal = max(1, round(weight_difference / ideal_weekly_loss, 0)) if weight_difference > 0 else 0
         elif goal == "gain_muscle":
-            ideal_weekly_gain = 0.25  # kg per week
             progress_status = "On track" if weight_difference < 0 else "Target reached"
-            weeks_to_goal = max(1, round(abs(weight_difference) / ideal_weekly_gain, 0)) if weight_difference < 0 else 0
         else:  # maintain
             progress_status = "Maintaining" if abs(weight_difference) <= 1 else "Adjustment needed"
-            weeks_to_goal = 0
         
         # Workout progress analysis
         recommended_workouts = 4  # per week
@@ -1219,24 +1635,18 @@ async def track_weekly_progress(current_weight: float, target_weight: float,
                 "workout_status": workout_status
             },
             "projections": {
-                "estimated_weeks_to_goal": int(weeks_to_goal) if weeks_to_goal > 0 else 0,
-                "target_date": (datetime.now() + timedelta(weeks=weeks_to_goal)).strftime("%Y-%m-%d") if weeks_to_goal > 0 else "Target achieved"
+                "estimated_weeks_to_goal": weeks_to_goal,
+                "target_date": (date.today() + timedelta(weeks=weeks_to_goal)).isoformat() if weeks_to_goal > 0 else "Target achieved"
             },
             "recommendations": recommendations,
             "next_week_targets": {
-                "weight_target": current_weight - ideal_weekly_loss if goal == "lose_weight" else current_weight + ideal_weekly_gain if goal == "gain_muscle" else current_weight,
+                "weight_target": current_weight + weekly_change,
                 "workout_target": recommended_workouts,
-                "focus_areas": [
-                    "Maintain consistent workout schedule",
-                    "Track food intake accurately",
-                    "Get adequate sleep (7-9 hours)",
-                    "Stay hydrated",
-                    "Monitor energy levels"
-                ]
+                "focus_areas": WEEKLY_FOCUS_AREAS
             }
         }
         
-        return json.dumps(progress_summary, indent=2)
+        return dumps(progress_summary)
         
     except Exception as e:
         return f"Error tracking progress: {str(e)}"
@@ -1246,39 +1656,34 @@ async def track_weekly_progress(current_weight: float, target_weight: float,
 # RESOURCES
 # =============================================================================
 
-@mcp.resource("fitness://status")
-def get_api_status() -> str:
-    """Get the current status and configuration of both APIs."""
-    status = {
-        "service": "Complete Fitness & Nutrition API",
-        "apis_integrated": [
-            {
-                "name": "Nutritionix",
-                "base_url": NUTRITIONIX_BASE_URL,
-                "status": "connected" if NUTRITIONIX_APP_ID and NUTRITIONIX_APP_KEY else "disconnected",
-                "features": ["Food search", "Nutrition analysis", "Meal planning", "Exercise calories"]
-            },
-            {
-                "name": "WGER",
-                "base_url": WGER_BASE_URL,
-                "status": "connected",
-                "features": ["Exercise database", "Workout templates", "Muscle group targeting", "Equipment-based exercises"]
-            }
-        ],
-        "combined_features": [
-            "Complete fitness plans",
-            "Pre/post workout nutrition",
-            "Progress tracking",
-            "Goal-based recommendations"
-        ]
-    }
-    return json.dumps(status, indent=2)
-
-
-@mcp.resource("fitness://help")
-def get_help() -> str:
-    """Get comprehensive help for the fitness and nutrition server."""
-    help_text = """
+# Credentials are read once at startup, so the status resource never changes
+API_STATUS = {
+    "service": "Complete Fitness & Nutrition API",
+    "apis_integrated": [
+        {
+            "name": "Nutritionix",
+            "base_url": NUTRITIONIX_BASE_URL,
+            "status": "connected" if NUTRITIONIX_APP_ID and NUTRITIONIX_APP_KEY else "disconnected",
+            "features": ["Food search", "Nutrition analysis", "Meal planning", "Exercise calories"]
+        },
+        {
+            "name": "WGER",
+            "base_url": WGER_BASE_URL,
+            "status": "connected",
+            "features": ["Exercise database", "Workout templates", "Muscle group targeting", "Equipment-based exercises"]
+        }
+    ],
+    "combined_features": [
+        "Complete fitness plans",
+        "Pre/post workout nutrition",
+        "Progress tracking",
+        "Goal-based recommendations"
+    ]
+}
+API_STATUS_JSON = dumps(API_STATUS)
+
+# Static help text served by the help resource
+HELP_TEXT = """
 # Complete Fitness & Nutrition MCP Server Help
 
 ## 🍎 NUTRITION TOOLS (Nutritionix API):
@@ -1297,7 +1702,7 @@ def get_help() -> str:
 - **get_exercises_by_muscle(muscle_group, limit=15)** - Get exercises by muscle group
   - Available muscle groups: chest, back, shoulders, arms, legs, abs, core
 - **get_equipment_exercises(equipment_name, limit=15)** - Get exercises by equipment
-  - Available equipment: dumbbell, barbell, bodyweight, machine, cable, kettlebell
+  - Available equipment: dumbbell, barbell, bodyweight, kettlebell, bench, pull-up bar
 - **get_workout_templates(difficulty="intermediate")** - Get pre-made workout templates
 - **calculate_exercise_calories(exercise_name, duration_min=30, weight_kg=70)** - Calculate calories burned
 
@@ -1384,7 +1789,18 @@ track_weekly_progress(78.5, 75, 3, "lose_weight")
 3. WGER API requires no authentication (free to use)
 4. Install: mcp install fitness_nutrition_server.py
 """
-    return help_text
+
+
+@mcp.resource("fitness://status")
+def get_api_status() -> str:
+    """Get the current status and configuration of both APIs."""
+    return API_STATUS_JSON
+
+
+@mcp.resource("fitness://help")
+def get_help() -> str:
+    """Get comprehensive help for the fitness and nutrition server."""
+    return HELP_TEXT
 
 
 if __name__ == "__main__":